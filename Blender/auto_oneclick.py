@@ -1,13 +1,24 @@
 # Blender/auto_oneclick.py
-# One-click, headless: JSON -> Mixamo rig baked -> FBX + MP4
+# One-click, headless: pose data -> Mixamo rig keyframed -> FBX + MP4
 # Requires Blender 4.x (bundled NumPy OK). No SciPy needed.
 
 import bpy, json, os, math
 import numpy as np
 import mathutils
 
+try:
+    import orjson   # faster parse when available; Blender's Python usually lacks it
+except ImportError:
+    orjson = None
+
+try:
+    from numba import njit, prange   # optional; Blender's bundled Python doesn't ship it
+except ImportError:
+    njit = None
+
 # ------------------- CONFIG -------------------
-JSON_PATH   = bpy.path.abspath("//output/pose_data.json")
+NPY_PATH    = bpy.path.abspath("//output/pose_data.npy")    # (T, 33, 4) from the extractor
+JSON_PATH   = bpy.path.abspath("//output/pose_data.json")   # legacy text format
 CHAR_FBX    = bpy.path.abspath("//assets/character.fbx")   # Mixamo character (T-pose)
 OUT_FBX     = bpy.path.abspath("//output/skinned_animation.fbx")
 OUT_MP4     = bpy.path.abspath("//output/anim.mp4")
@@ -26,31 +37,60 @@ def safe_clear_scene():
     for b in bpy.data.actions: bpy.data.actions.remove(b)
 
 def load_pose_json(path):
-    with open(path, "r") as f:
-        data = json.load(f)
+    """Parse pose JSON straight into a preallocated (T, L, 3) float32 array of x, y, z."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    data = orjson.loads(raw) if orjson else json.loads(raw)
     if not data:
         raise ValueError("Pose JSON empty.")
-    return data
+    # frames are either {"landmarks": [...]} or a bare list of landmark dicts
+    frames = [f["landmarks"] if isinstance(f, dict) else f for f in data]
+    arr = np.empty((len(frames), max(len(f) for f in frames), 3), dtype=np.float32)
+    last = None
+    for i, lms in enumerate(frames):
+        if not lms:
+            # no pose detected: carry the last detected frame forward
+            if last is not None:
+                arr[i] = arr[last]
+            continue
+        arr[i, :, 0] = [lm["x"] for lm in lms]
+        arr[i, :, 1] = [lm["y"] for lm in lms]
+        arr[i, :, 2] = [lm["z"] for lm in lms]
+        if last is None:
+            arr[:i] = arr[i]   # leading gap takes the first detection
+        last = i
+    if last is None:
+        raise ValueError("Pose JSON has no detected poses.")
+    return arr
+
+def load_pose_npy(path):
+    """Read the extractor's (T, L, 4) .npy and keep x, y, z as float32."""
+    # Plain read, no memory map: a long-lived Blender worker must not keep the
+    # file mapped (Windows cannot replace a mapped file on the next extraction)
+    return np.load(path)[..., :3].astype(np.float32, copy=False)
+
+def load_pose(path):
+    if path.endswith(".npy"):
+        return load_pose_npy(path)
+    return load_pose_json(path)
 
 def moving_average(arr, win):
     if win < 3 or win % 2 == 0: return arr
-    k = np.ones(win) / win
-    # pad at ends to keep same length
+    # pad at ends to keep same length (edge replication, like mode='nearest')
     pad = win // 2
-    arr_p = np.pad(arr, ((pad,pad),(0,0),(0,0)), mode='edge')
-    out = np.empty_like(arr)
-    for i in range(arr.shape[2]):  # x,y,z
-        out[:,:,i] = np.apply_along_axis(lambda m: np.convolve(m, k, mode='valid'), 0, arr_p[:,:,i])
-    return out
-
-def norm_to_world(lm, sx, sy, sz):
-    x = (lm[0] - 0.5) * VIDEO_W / 100.0 * SCALE * sx
-    y = (lm[1] - 0.5) * VIDEO_H / 100.0 * SCALE * sy
-    z = -lm[2] * SCALE * sz
-    return (x, y, z)
-
-def mid(a, b):
-    return ( (a[0]+b[0])/2.0, (a[1]+b[1])/2.0, (a[2]+b[2])/2.0 )
+    arr_p = np.pad(arr, ((pad,pad),) + ((0,0),) * (arr.ndim - 1), mode='edge')
+    # running sum along time: O(T*L*3) for any window, no per-axis Python loop
+    c = np.cumsum(arr_p, axis=0, dtype=np.float64)
+    c = np.concatenate([np.zeros((1,) + c.shape[1:], c.dtype), c], axis=0)
+    return ((c[win:] - c[:-win]) / win).astype(arr.dtype, copy=False)
+
+def norm_to_world(arr, sx=1, sy=1, sz=1):
+    """(..., 3) normalized landmarks -> (..., 3) float32 world coords, one broadcast."""
+    offset = np.array([0.5, 0.5, 0.0], dtype=np.float32)
+    scale_xyz = np.array([VIDEO_W / 100.0 * SCALE * sx,
+                          VIDEO_H / 100.0 * SCALE * sy,
+                          -SCALE * sz], dtype=np.float32)
+    return (arr - offset) * scale_xyz
 
 def ensure_camera_light():
     cam = None
@@ -113,37 +153,30 @@ def resolve_bone(rig, name):
     if pb: return pb
     return get_bone(rig, name.split(":")[-1])
 
-def vector_to_quat(vec, rest_axis):
+def quats_from_vectors(vec, rest_axis=(0, 1, 0)):
     """
-    Converts a world-space vector into a quaternion aligning rest_axis -> vec.
+    Batched rest_axis -> vec alignment: (..., 3) vectors -> (..., 4) wxyz quats.
+    Uses the half-vector form (a.h, a x h), so there is one sqrt and no trig.
     """
-    vec = vec.normalized()
-    rest_axis = rest_axis.normalized()
-    rot_axis = rest_axis.cross(vec)
-    if rot_axis.length < 1e-6:  # parallel
-        return mathutils.Quaternion()
-    rot_axis.normalize()
-    angle = rest_axis.angle(vec)
-    return mathutils.Quaternion(rot_axis, angle)
-
-
-
-def vector_to_quaternion(target_vector, bone_local_axis=(0, 1, 0)):
-    """
-    Compute quaternion to align bone_local_axis with target_vector
-    Most Mixamo bones point down their local Y-axis by default
-    """
-    if target_vector.length < 1e-6:
-        return mathutils.Quaternion()  # identity
-    
-    local_axis = mathutils.Vector(bone_local_axis).normalized()
-    target_normalized = target_vector.normalized()
-    
-    # Quaternion to rotate local_axis to target_normalized
-    return local_axis.rotation_difference(target_normalized)
+    rest = np.asarray(rest_axis, dtype=np.float32)
+    rest = rest / np.linalg.norm(rest)
+    n = vec / np.maximum(np.linalg.norm(vec, axis=-1, keepdims=True), 1e-12)
+    h = rest + n
+    h_len = np.linalg.norm(h, axis=-1, keepdims=True)
+    anti = h_len[..., 0] < 1e-6   # vec points opposite rest_axis
+    h = h / np.where(h_len < 1e-6, 1.0, h_len)
+
+    q = np.empty(vec.shape[:-1] + (4,), dtype=np.float32)
+    q[..., 0] = h @ rest
+    q[..., 1:] = np.cross(rest, h)
+
+    # 180 degrees about any axis perpendicular to rest_axis
+    perp = np.cross(rest, (1.0, 0.0, 0.0))
+    if np.linalg.norm(perp) < 1e-6:
+        perp = np.cross(rest, (0.0, 1.0, 0.0))
+    q[anti] = (0.0, *(perp / np.linalg.norm(perp)))
+    return q
 
-# Global orientation correction (rotates rig from lying upside down to upright)
-GLOBAL_CORRECTION = mathutils.Euler((-1.5708, 0, 0), 'XYZ').to_quaternion()
 # Mixamo correction dictionary
 BONE_CORRECTIONS = {
     "mixamorig:LeftArm": mathutils.Euler((0, 0, -90), 'XYZ').to_quaternion(),
@@ -155,7 +188,76 @@ BONE_CORRECTIONS = {
     "mixamorig:Head": mathutils.Quaternion((1,0,0,0)),
 }
 
-def apply_quaternion_animation(rig, landmark_data_world, frame_count):
+def qmul(a, b):
+    """Batched Hamilton product a @ b over (..., 4) wxyz arrays (broadcasting)."""
+    aw, ax, ay, az = a[..., 0], a[..., 1], a[..., 2], a[..., 3]
+    bw, bx, by, bz = b[..., 0], b[..., 1], b[..., 2], b[..., 3]
+    return np.stack([
+        aw*bw - ax*bx - ay*by - az*bz,
+        aw*bx + ax*bw + ay*bz - az*by,
+        aw*by - ax*bz + ay*bw + az*bx,
+        aw*bz + ax*by - ay*bx + az*bw,
+    ], axis=-1)
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _bone_quats_jit(vecs, corr):
+        """Fused normalize + half-vector quat (rest = +Y) + corr @ quat, one pass per frame."""
+        T, B = vecs.shape[0], vecs.shape[1]
+        out = np.empty((T, B, 4), dtype=np.float32)
+        for t in prange(T):
+            for b in range(B):
+                x, y, z = vecs[t, b, 0], vecs[t, b, 1], vecs[t, b, 2]
+                n = max(np.sqrt(x*x + y*y + z*z), 1e-12)
+                hx, hy, hz = x / n, 1.0 + y / n, z / n
+                hl = np.sqrt(hx*hx + hy*hy + hz*hz)
+                if hl < 1e-6:   # antiparallel to +Y: 180 degrees about -Z (as quats_from_vectors)
+                    qw, qx, qy, qz = 0.0, 0.0, 0.0, -1.0
+                else:
+                    # (Y.h, Y x h) with Y = (0, 1, 0)
+                    qw, qx, qy, qz = hy / hl, hz / hl, 0.0, -hx / hl
+                cw, cx, cy, cz = corr[b, 0], corr[b, 1], corr[b, 2], corr[b, 3]
+                out[t, b, 0] = cw*qw - cx*qx - cy*qy - cz*qz
+                out[t, b, 1] = cw*qx + cx*qw + cy*qz - cz*qy
+                out[t, b, 2] = cw*qy - cx*qz + cy*qw + cz*qx
+                out[t, b, 3] = cw*qz + cx*qy - cy*qx + cz*qw
+        return out
+
+def bone_quats(vecs, corr):
+    """
+    (T, B, 3) bone directions + (B, 4) corrections -> (T, B, 4) corrected quats,
+    for bones resting along +Y. Uses the Numba kernel when available.
+    """
+    if njit is not None:
+        return _bone_quats_jit(np.ascontiguousarray(vecs, dtype=np.float32),
+                               np.ascontiguousarray(corr, dtype=np.float32))
+    return qmul(corr[None], quats_from_vectors(vecs, (0, 1, 0)))
+
+KEY_INTERP_LINEAR = 1   # enum index of 'LINEAR' in Keyframe.interpolation
+
+def write_fcurves(action, owner, data_path, frames, values, group):
+    """
+    Write (N, C) values as C f-curves of N keyframes each for owner (the object the action is assigned to).
+    One keyframe_points.add + foreach_set per curve instead of N keyframe_insert calls.
+    """
+    n = len(frames)
+    for c in range(values.shape[1]):
+        if hasattr(action, "fcurve_ensure_for_datablock"):
+            # Blender 4.4+ slotted actions: creates the owner's slot on first use and
+            # assigns it, so the curves are not left on a slot nothing plays/exports
+            fc = action.fcurve_ensure_for_datablock(owner, data_path, index=c, group_name=group)
+        else:
+            fc = action.fcurves.new(data_path=data_path, index=c, action_group=group)
+        fc.keyframe_points.add(n)
+        co = np.empty((n, 2), dtype=np.float32)
+        co[:, 0] = frames
+        co[:, 1] = values[:, c]
+        fc.keyframe_points.foreach_set("co", co.ravel())
+        # dense per-frame samples: LINEAR skips all bezier handle math
+        fc.keyframe_points.foreach_set("interpolation", np.full(n, KEY_INTERP_LINEAR, dtype=np.int32))
+        fc.update()   # once per curve, after all points are in
+
+def apply_quaternion_animation(rig, world, frame_count):
     """
     Apply quaternion-based animation to Mixamo rig bones with improved handling
     """
@@ -210,71 +312,63 @@ def apply_quaternion_animation(rig, landmark_data_world, frame_count):
     
     print(f" Will animate {len(existing_bones)} bones")
     
-    # Simple direct animation - full range
-    for frame_idx in range(frame_count):
-        frame_num = START_FRAME + frame_idx
-        bpy.context.scene.frame_set(frame_num)
+    # Corrections packed once in existing_bones order: (B, 4) float32 wxyz rows
+    corr_arr = np.stack([np.array(BONE_CORRECTIONS.get(bone_name, mathutils.Quaternion((1,0,0,0)))[:], np.float32)
+                         for bone_name, _, _, _ in existing_bones], axis=0)
+    
+    # Joint table resolved once: integer column per semantic name into positions_arr
+    joint_names = list(mp_indices) + ['hip_center', 'shoulder_center']
+    joint_idx = {name: i for i, name in enumerate(joint_names)}
+    compiled = [(bone_name, bone, joint_idx[from_key], joint_idx[to_key])
+                for bone_name, from_key, to_key, bone in existing_bones]
+    from_idx = np.array([c[2] for c in compiled], dtype=np.intp)
+    to_idx = np.array([c[3] for c in compiled], dtype=np.intp)
+    
+    # positions_arr: (T, J, 3) - the 13 MediaPipe joints plus derived hip/shoulder centers
+    world = world[:frame_count]
+    hip_center_arr = 0.5 * (world[:, mp_indices['left_hip']] + world[:, mp_indices['right_hip']])
+    shoulder_center_arr = 0.5 * (world[:, mp_indices['left_shoulder']] + world[:, mp_indices['right_shoulder']])
+    positions_arr = np.concatenate([world[:, list(mp_indices.values())],
+                                    hip_center_arr[:, None], shoulder_center_arr[:, None]], axis=1)
+    
+    # Phase 1: every bone direction and quaternion for the whole clip, (T, B, ...)
+    vecs = positions_arr[:, to_idx] - positions_arr[:, from_idx]
+    valid = np.linalg.norm(vecs, axis=-1) >= 1e-6
+    
+    for _, bone, _, _ in compiled:
+        bone.rotation_mode = 'QUATERNION'
     
-        # Get landmark positions for this frame
-        landmarks = landmark_data_world[frame_idx]
+    # Quaternions + corrections for all frames and bones (Mixamo bones usually rest along +Y)
+    final = bone_quats(vecs, corr_arr)
     
-        # Derived positions
-        hip_center = mid(landmarks[mp_indices['left_hip']], landmarks[mp_indices['right_hip']])
-        shoulder_center = mid(landmarks[mp_indices['left_shoulder']], landmarks[mp_indices['right_shoulder']])
+    # Rig world transform is not animated: invert it once and move every hip position in one shot.
+    # Only its rotation/scale part is used: the alignment translation used to be baked into the
+    # armature by transform_apply, so hip keys stay absolute positions (not offsets from frame 0)
+    rig_linear_inv = np.array(rig.matrix_world.to_3x3().inverted(), dtype=np.float32)   # (3, 3)
+    hip_local_all = hip_center_arr @ rig_linear_inv.T
     
-        positions = {
-            'hip_center': mathutils.Vector(hip_center),
-            'shoulder_center': mathutils.Vector(shoulder_center),
-            'nose': mathutils.Vector(landmarks[mp_indices['nose']]),
-            'left_shoulder': mathutils.Vector(landmarks[mp_indices['left_shoulder']]),
-            'right_shoulder': mathutils.Vector(landmarks[mp_indices['right_shoulder']]),
-            'left_elbow': mathutils.Vector(landmarks[mp_indices['left_elbow']]),
-            'left_wrist': mathutils.Vector(landmarks[mp_indices['left_wrist']]),
-            'right_elbow': mathutils.Vector(landmarks[mp_indices['right_elbow']]),
-            'right_wrist': mathutils.Vector(landmarks[mp_indices['right_wrist']]),
-            'left_hip': mathutils.Vector(landmarks[mp_indices['left_hip']]),
-            'right_hip': mathutils.Vector(landmarks[mp_indices['right_hip']]),
-            'left_knee': mathutils.Vector(landmarks[mp_indices['left_knee']]),
-            'left_ankle': mathutils.Vector(landmarks[mp_indices['left_ankle']]),
-            'right_knee': mathutils.Vector(landmarks[mp_indices['right_knee']]),
-            'right_ankle': mathutils.Vector(landmarks[mp_indices['right_ankle']]),
-        }
+    # Phase 2: write whole f-curves at once instead of per-frame keyframe_insert
+    action = bpy.data.actions.new("PoseAction")
+    rig.animation_data_create()
+    rig.animation_data.action = action
+    frames = np.arange(START_FRAME, START_FRAME + frame_count, dtype=np.float32)
     
-        for bone_name, from_key, to_key, bone in existing_bones:
-            from_pos = positions.get(from_key)
-            to_pos   = positions.get(to_key)
-            if from_pos is None or to_pos is None:
-                continue
-            target_vector = to_pos - from_pos
-            if target_vector.length < 1e-6:
-                continue
+    for b, (bone_name, bone, _, _) in enumerate(compiled):
+        keep = valid[:, b]
+        data_path = f'pose.bones["{bone.name}"]'
     
-            # Hips: set location (converted to armature local)
-            if bone_name == "mixamorig:Hips":
-                hip_local = rig.matrix_world.inverted() @ mathutils.Vector(hip_center)
-                bone.location = hip_local
-                bone.keyframe_insert("location", frame=frame_num)
+        # Hips: set location (converted to armature local)
+        if bone_name == "mixamorig:Hips":
+            write_fcurves(action, rig, data_path + ".location", frames[keep], hip_local_all[keep], bone.name)
     
-            # Put a simple rotation for now (replace with real quaternion math later)
-            # Using a small rotation proportional to frame index to ensure keyframes exist:
-            # test_rotation = mathutils.Quaternion((1, 0, 0), math.radians(5 * (frame_idx % 72)))
-            # Step: Convert landmark vector into quaternion
-            rest_axis = mathutils.Vector((0, 1, 0))  # Mixamo bones usually rest along +Y
-            quat = vector_to_quat(target_vector, rest_axis)
-            
-            # Step: Apply correction
-            corr = BONE_CORRECTIONS.get(bone_name, mathutils.Quaternion((1,0,0,0)))
-            final_quat = corr @ quat
-            
-            # Step: Insert keyframe
-            bone.rotation_mode = 'QUATERNION'
-            bone.rotation_quaternion = final_quat
-            bone.keyframe_insert("rotation_quaternion", frame=frame_num)
+        write_fcurves(action, rig, data_path + ".rotation_quaternion", frames[keep], final[keep, b], bone.name)
 
 
     # After we finish, set the scene range to match the full animation
     bpy.context.scene.frame_start = START_FRAME
     bpy.context.scene.frame_end   = START_FRAME + frame_count - 1
+    # Single scene-time advance so the pose reflects the new action (no per-frame frame_set)
+    bpy.context.scene.frame_set(START_FRAME)
     print(f" Scene frame range set: {bpy.context.scene.frame_start}..{bpy.context.scene.frame_end}")
 
 def bake_pose(obj, f_start, f_end):
@@ -303,22 +397,22 @@ def setup_render(fps, out_mp4, frame_end):
     s.render.filepath = out_mp4
 
 def check_inputs_or_die():
-    json_abs = bpy.path.abspath(JSON_PATH)
+    pose_abs = bpy.path.abspath(NPY_PATH if os.path.exists(NPY_PATH) else JSON_PATH)
     fbx_abs  = bpy.path.abspath(CHAR_FBX)
     out_fbx_abs = bpy.path.abspath(OUT_FBX)
     out_mp4_abs = bpy.path.abspath(OUT_MP4)
 
     print("\n--- PATH CHECK ---")
-    print("JSON_PATH:", json_abs, "exists:", os.path.exists(json_abs))
+    print("POSE_PATH:", pose_abs, "exists:", os.path.exists(pose_abs))
     print("CHAR_FBX :", fbx_abs,  "exists:", os.path.exists(fbx_abs))
     print("OUT_FBX  :", out_fbx_abs)
     print("OUT_MP4  :", out_mp4_abs)
     print("Blend file:", bpy.data.filepath if bpy.data.filepath else "(unsaved!)")
     print("------------------\n")
 
-    if not os.path.exists(json_abs):
+    if not os.path.exists(pose_abs):
         raise FileNotFoundError(
-            f"Pose JSON not found at {json_abs}.\n"
+            f"Pose data not found at {pose_abs}.\n"
             "Tip: Save your .blend so // resolves correctly, or use absolute paths."
         )
     if not os.path.exists(fbx_abs):
@@ -326,36 +420,29 @@ def check_inputs_or_die():
             f"Character FBX not found at {fbx_abs}.\n"
             "Tip: Save your .blend so // resolves correctly, or use absolute paths."
         )
+    return pose_abs
 
 
 # ------------------- PIPELINE -------------------
 
-check_inputs_or_die()
+POSE_PATH = check_inputs_or_die()
 
 safe_clear_scene()
 ensure_camera_light()
 
 # 1) Load and smooth
-pose = load_pose_json(JSON_PATH)
-T = len(pose)
-L = len(pose[0]["landmarks"])
-arr = np.array([[[lm["x"], lm["y"], lm["z"]] for lm in f["landmarks"]] for f in pose], dtype=np.float32)
+arr = load_pose(POSE_PATH)
+T, L = arr.shape[:2]
 arr_s = moving_average(arr, SMOOTH_WINDOW)
 
-print(f" Loaded pose JSON frames: {T}, landmarks per frame: {L}")
+print(f" Loaded pose frames: {T}, landmarks per frame: {L}")
 # show indices of first and last frames (first landmark of each)
-print("First landmark sample:", pose[0]["landmarks"][0])
-print("Last landmark sample:", pose[-1]["landmarks"][0])
+print("First landmark sample:", arr[0, 0])
+print("Last landmark sample:", arr[-1, 0])
 
 
-# 2) Convert landmarks to world coordinates
-landmark_data_world = {}
-for frame_idx in range(T):
-    frame_landmarks = []
-    for lm_idx in range(L):
-        world_pos = norm_to_world(arr_s[frame_idx, lm_idx], sx=1, sy=1, sz=1)
-        frame_landmarks.append(world_pos)
-    landmark_data_world[frame_idx] = frame_landmarks
+# 2) Convert landmarks to world coordinates -> contiguous (T, L, 3) float32
+world = np.ascontiguousarray(norm_to_world(arr_s[:, :, :3]), dtype=np.float32)
 
 # 3) Import character
 rig = import_mixamo(CHAR_FBX)
@@ -398,7 +485,7 @@ for m in imported_meshes:
 mp_LS, mp_RS, mp_LH, mp_RH = 11, 12, 23, 24
 
 # Get first-frame positions to estimate scale
-first_frame = landmark_data_world[0]
+first_frame = world[0]
 p_ls = mathutils.Vector(first_frame[mp_LS])
 p_rs = mathutils.Vector(first_frame[mp_RS])
 p_lh = mathutils.Vector(first_frame[mp_LH])
@@ -418,21 +505,24 @@ if hips and neck:
     rig_neck_w = rig.matrix_world @ neck.head
     rig_torso_len = (rig_neck_w - rig_hips_w).length
     
+    _, rig_rot, rig_scale = rig.matrix_world.decompose()
     if mp_torso_len > 1e-6 and rig_torso_len > 1e-6:
         scale = rig_torso_len / mp_torso_len
-        rig.scale = (scale, scale, scale)
-        bpy.ops.object.transform_apply(location=False, rotation=False, scale=True)
+        rig_scale = mathutils.Vector((scale, scale, scale))
 
-    # Position rig at MediaPipe hip center
-    rig.location = mp_hip_center
-    bpy.ops.object.transform_apply(location=True, rotation=False, scale=False)
+    # Position rig at MediaPipe hip center: one matrix write instead of two
+    # transform_apply passes (each a depsgraph sweep + armature/mesh rewrite)
+    rig.matrix_world = (mathutils.Matrix.Translation(mp_hip_center)
+                        @ rig_rot.to_matrix().to_4x4()
+                        @ mathutils.Matrix.Diagonal(rig_scale).to_4x4())
 
 # 5) Apply quaternion-based animation (NEW APPROACH)
-apply_quaternion_animation(rig, landmark_data_world, T)
+apply_quaternion_animation(rig, world, T)
 
-# 6) Bake to the character rig
+# 6) No bake needed: keyframes are authored directly on the rig, and the
+#    scene frame range set above lets the FBX exporter see the full clip.
+#    Call bake_pose() again only if IK/constraint-driven motion is added.
 frame_end = T
-bake_pose(rig, START_FRAME, START_FRAME + frame_end - 1)
 
 # 7) Export FBX (select rig + meshes)
 bpy.ops.object.mode_set(mode='OBJECT', toggle=False)  # ensure OBJECT mode
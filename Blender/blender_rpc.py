@@ -0,0 +1,47 @@
+# Blender/blender_rpc.py
+# Long-lived headless Blender worker for app.py: pays Blender's startup once and
+# runs auto_oneclick.py for every request it receives.
+#   blender --background --python Blender/blender_rpc.py
+# Protocol: one JSON request per line on stdin; for each, one line starting with
+# RPC_PREFIX followed by a JSON reply on stdout (everything else is log output).
+#   {"script": "<path to auto_oneclick.py>"} -> {"ok": true} / {"ok": false, "error": "..."}
+#   {"op": "ping"}                           -> {"ok": true}
+
+import bpy, gc, json, os, runpy, sys, traceback
+
+RPC_PREFIX = "@@animotion-rpc "
+DEFAULT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "auto_oneclick.py")
+
+def reply(**resp):
+    sys.stdout.write(RPC_PREFIX + json.dumps(resp) + "\n")
+    sys.stdout.flush()
+
+def handle(req):
+    if req.get("op") == "ping":
+        return
+    # Start every job from an empty scene so nothing (meshes, actions, images)
+    # carries over from the previous character
+    bpy.ops.wm.read_homefile(use_empty=True)
+    try:
+        runpy.run_path(req.get("script", DEFAULT_SCRIPT), run_name="__main__")
+    finally:
+        # The job's globals and functions form reference cycles; collect them now
+        # so nothing (arrays, open files) outlives the job while the worker idles
+        gc.collect()
+
+reply(ok=True, ready=True)
+for line in sys.stdin:
+    if not line.strip():
+        continue
+    try:
+        handle(json.loads(line))
+    except (Exception, SystemExit) as e:
+        traceback.print_exc()
+        sys.stderr.flush()
+        reply(ok=False, error=f"{type(e).__name__}: {e}")
+        failed = True
+    else:
+        reply(ok=True)
+        failed = False
+    if failed:
+        gc.collect()  # the traceback kept the failed job's globals alive until here
@@ -1,77 +1,45 @@
-import cv2
-import mediapipe as mp
-import json
+import atexit
 import os
+from extract_pose import create_pose, run_extraction
 
-def extract_pose_from_video(video_path, output_json_path):
+# Thin CLI wrapper kept for old callers; extraction itself lives in extract_pose.py
+# (decode thread, buffer reuse, POSE_COMPLEXITY, smoothing off, streamed .npy).
+
+_POSE_SINGLETON = None
+
+def _get_pose():
+    """Lazily build one pose detector and reuse it for every video."""
+    global _POSE_SINGLETON
+    if _POSE_SINGLETON is None:
+        _POSE_SINGLETON = create_pose()
+        atexit.register(_POSE_SINGLETON.close)
+    return _POSE_SINGLETON
+
+def extract_pose_from_video(video_path, output_path):
     print("Starting pose extraction...")
-    
-    # Initialize MediaPipe Pose
-    mp_pose = mp.solutions.pose
-    pose = mp_pose.Pose(
-        static_image_mode=False,
-        model_complexity=1,
-        smooth_landmarks=True,
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5
-    )
-    
-    # Open video file
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        print("ERROR: Could not open video file")
+    # Always binary .npy, even if an old caller still passes a .json name
+    output_path = os.path.splitext(output_path)[0] + '.npy'
+    try:
+        pose_arr, detected = run_extraction(video_path, _get_pose(), output_path)
+    except Exception as e:
+        print(f"ERROR: {e}")
         return False
     
-    pose_data = []
-    frame_count = 0
-    
-    print("Processing video frames...")
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-            
-        # Convert BGR to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Process frame with MediaPipe
-        results = pose.process(rgb_frame)
-        
-        if results.pose_landmarks:
-            landmarks = []
-            for landmark in results.pose_landmarks.landmark:
-                landmarks.append({
-                    'x': landmark.x,
-                    'y': landmark.y, 
-                    'z': landmark.z,
-                    'visibility': landmark.visibility
-                })
-            pose_data.append(landmarks)
-        else:
-            pose_data.append([])  # No pose detected
-        
-        frame_count += 1
-        if frame_count % 30 == 0:
-            print(f"Processed {frame_count} frames...")
-    
-    # Release resources
-    cap.release()
-    pose.close()
-    
-    # Save pose data to JSON
-    os.makedirs(os.path.dirname(output_json_path), exist_ok=True)
-    with open(output_json_path, 'w') as f:
-        json.dump(pose_data, f, indent=2)
+    if not detected.any():
+        print("ERROR: No pose detected in any frame")
+        return False
+    print(f"Frames with a detected pose: {int(detected.sum())}/{len(pose_arr)}")
     
-    print(f"SUCCESS: Pose data saved to {output_json_path}")
-    print(f"Total frames processed: {frame_count}")
+    print(f"SUCCESS: Pose data saved to {output_path}")
+    print(f"Total frames processed: {len(pose_arr)}")
+    print(f"FRAME_COUNT={len(pose_arr)}")
     
     return True
 
 if __name__ == "__main__":
     # These will be replaced by Flask
     video_path = r"c:\Users\admin\Desktop\AniMotion\input\vid6.mp4"
-    output_path = "output/pose_data.json"
+    output_path = "output/pose_data.npy"
     
     success = extract_pose_from_video(video_path, output_path)
     if not success:
@@ -1,14 +1,45 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Request, Response, render_template, request, jsonify, send_file
 import os
+import re
+import stat
 import subprocess
 import shutil
+import tempfile
+import functools
+import hashlib
+import hmac
+import uuid
+import atexit
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
 import json
 import time
+import numpy as np
+import threading
 from flask_httpauth import HTTPBasicAuth
 from werkzeug.security import generate_password_hash, check_password_hash
+from extract_pose import POSE_COMPLEXITY, create_pose, run_extraction, pose_to_json
+
+class DirectUploadRequest(Request):
+    """
+    Spool multipart file parts straight into a named file under UPLOAD_FOLDER,
+    so routes can move an upload into place instead of copying it a second time.
+    """
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        spool = tempfile.NamedTemporaryFile(dir=UPLOAD_FOLDER, prefix='upload_', delete=False)
+        self._spooled_paths = getattr(self, '_spooled_paths', []) + [spool.name]
+        return spool
+
+    def close(self):
+        super().close()
+        # Remove parts that no route claimed
+        for path in getattr(self, '_spooled_paths', []):
+            if os.path.exists(path):
+                os.remove(path)
 
 app = Flask(__name__)
+app.request_class = DirectUploadRequest
 
 # Configuration
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -22,23 +53,88 @@ ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'json', 'fbx'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max file size
+# Behind Apache/lighttpd: let the front-end server send downloads (X-Sendfile)
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
+# Behind nginx: internal location aliased to OUTPUT_FOLDER, e.g. /protected-output/
+X_ACCEL_PREFIX = os.environ.get('X_ACCEL_PREFIX', '')
 
 # Create directories if they don't exist
 for folder in [UPLOAD_FOLDER, OUTPUT_FOLDER, INPUT_FOLDER, ASSETS_FOLDER]:
     os.makedirs(folder, exist_ok=True)
 
+# One MediaPipe Pose graph per process, built on first use (or at startup) and
+# reused for every request. Created lazily so a preloading server (gunicorn
+# --preload) forks before the TFLite graph exists and each worker builds its own.
+# Graphs are not thread-safe, so extraction runs under a lock.
+POSE = None
+POSE_LOCK = threading.Lock()
+
+def get_pose():
+    """Process-wide Pose graph; caller must hold POSE_LOCK."""
+    global POSE
+    if POSE is None:
+        POSE = create_pose(model_complexity=POSE_COMPLEXITY, smooth_landmarks=False,
+                           enable_segmentation=False)
+    return POSE
+
+# Blender runs in the background so /animate-character returns immediately.
+# One worker: every run shares assets/character.fbx and the output folder.
+BLENDER_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+ANIMATE_JOBS = {}  # job_id -> Future
+ANIMATE_JOB_TTL = 3600  # seconds a finished job's result stays pollable
+
+def prune_animate_jobs():
+    """Forget jobs that finished more than ANIMATE_JOB_TTL ago."""
+    now = time.monotonic()
+    for job_id, future in list(ANIMATE_JOBS.items()):
+        if future.done() and now - getattr(future, 'finished_at', now) > ANIMATE_JOB_TTL:
+            ANIMATE_JOBS.pop(job_id, None)
+
+# Persistent headless Blender (Blender/blender_rpc.py) that runs auto_oneclick.py
+# per job, so Blender's startup is paid once. BLENDER_PERSISTENT=0 launches a
+# fresh Blender for every job instead.
+BLENDER_PERSISTENT = os.environ.get('BLENDER_PERSISTENT', '1') == '1'
+BLENDER_RPC_PREFIX = '@@animotion-rpc '  # must match Blender/blender_rpc.py
+BLENDER_RPC_LOCK = threading.Lock()
+_blender_proc = None
+_blender_lines = None  # queue of worker output lines; None marks exit
+_blender_restart_pending = False  # set by /reload-blender while a job is running
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def store_upload(file_storage, dest_path):
+    """Move a spooled upload to dest_path (a rename on the same disk); copy as a fallback."""
+    spool_path = getattr(file_storage.stream, 'name', None)
+    if isinstance(spool_path, str) and os.path.exists(spool_path):
+        file_storage.stream.close()
+        shutil.move(spool_path, dest_path)
+    else:
+        file_storage.save(dest_path)
+
 # Add after app initialization
 auth = HTTPBasicAuth()
 users = {
     "admin": generate_password_hash("admin")
 }
 
+# Successful logins are remembered for a short time so the password KDF runs
+# once per AUTH_CACHE_TTL instead of on every request. Entries hold an HMAC of
+# the password under a per-process key, never the password itself.
+AUTH_CACHE_TTL = 300  # seconds
+_AUTH_CACHE_KEY = os.urandom(32)
+_auth_cache = {}  # username -> (password digest, expiry)
+
 @auth.verify_password
 def verify_password(username, password):
-    if username in users and check_password_hash(users.get(username), password):
+    if username not in users:
+        return None
+    digest = hmac.new(_AUTH_CACHE_KEY, password.encode(), hashlib.sha256).digest()
+    cached = _auth_cache.get(username)
+    if cached and cached[1] > time.monotonic() and hmac.compare_digest(cached[0], digest):
+        return username
+    if check_password_hash(users.get(username), password):
+        _auth_cache[username] = (digest, time.monotonic() + AUTH_CACHE_TTL)
         return username
 
 # Protect your main routes
@@ -47,6 +143,36 @@ def verify_password(username, password):
 def index():
     return render_template('index.html')
 
+def run_pose_extraction(input_video_path):
+    """Extract pose data from a saved video and build the JSON response."""
+    print(f"Video saved to: {input_video_path}")
+    
+    print("Running pose extraction...")
+    
+    # In-process on the warm MediaPipe graph (no interpreter/model startup per request)
+    with POSE_LOCK:
+        # Streamed straight to output/pose_data.npy (only written if a pose was found)
+        pose_arr, detected = run_extraction(
+            input_video_path, get_pose(), os.path.join(OUTPUT_FOLDER, 'pose_data.npy'))
+    
+    if not detected.any():
+        # Drop the previous video's pose data too, so Module 2 cannot silently
+        # animate a character with it after this failed extraction
+        for name in ('pose_data.npy', 'pose_data.json'):
+            try:
+                os.remove(os.path.join(OUTPUT_FOLDER, name))
+            except FileNotFoundError:
+                pass
+        return jsonify({'error': 'No pose detected in the video'}), 400
+    
+    frame_count = len(pose_arr)
+    
+    return jsonify({
+        'success': True,
+        'message': f'Pose extraction completed: {frame_count} frames processed',
+        'frame_count': frame_count
+    })
+
 @app.route('/extract-pose', methods=['POST'])
 def extract_pose():
     try:
@@ -61,56 +187,37 @@ def extract_pose():
         if video_file and allowed_file(video_file.filename):
             filename = secure_filename(video_file.filename)
             input_video_path = os.path.join(INPUT_FOLDER, filename)
-            video_file.save(input_video_path)
-            
-            print(f"Video saved to: {input_video_path}")
+            store_upload(video_file, input_video_path)
             
-            # Use the simple version
-            extract_script = os.path.join(BASE_DIR, '_temp_extract_pose.py')
-            
-            if not os.path.exists(extract_script):
-                return jsonify({'error': 'extract_pose_simple.py not found'}), 500
-            
-            print("Running pose extraction...")
-            
-            # Run directly with video path as argument
-            result = subprocess.run(
-                ['python', extract_script, input_video_path],
-                cwd=BASE_DIR,
-                capture_output=True,
-                text=True,
-                timeout=300
-            )
-            
-            print(f"Return code: {result.returncode}")
-            print(f"Stdout: {result.stdout}")
-            if result.stderr:
-                print(f"Stderr: {result.stderr}")
-            
-            if result.returncode != 0:
-                return jsonify({'error': f'Pose extraction failed. Return code: {result.returncode}'}), 500
-            
-            # Check output
-            json_output = os.path.join(OUTPUT_FOLDER, 'pose_data.json')
-            if not os.path.exists(json_output):
-                return jsonify({'error': 'Output JSON file was not created'}), 500
-            
-            # Get frame count
-            with open(json_output, 'r') as f:
-                pose_data = json.load(f)
-                frame_count = len(pose_data)
-            
-            return jsonify({
-                'success': True,
-                'message': f'Pose extraction completed: {frame_count} frames processed',
-                'json_file': 'pose_data.json',
-                'frame_count': frame_count
-            })
+            return run_pose_extraction(input_video_path)
         
         return jsonify({'error': 'Invalid file type'}), 400
     
-    except subprocess.TimeoutExpired:
-        return jsonify({'error': 'Pose extraction timed out'}), 500
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/extract-pose-stream', methods=['POST'])
+def extract_pose_stream():
+    """
+    Same as /extract-pose, but the video is the raw request body
+    (application/octet-stream) and its name is in the X-Filename header.
+    The body is copied to disk in 1 MiB chunks with no multipart parsing.
+    """
+    try:
+        filename = secure_filename(request.headers.get('X-Filename', ''))
+        if not filename:
+            return jsonify({'error': 'X-Filename header required'}), 400
+        
+        if not allowed_file(filename):
+            return jsonify({'error': 'Invalid file type'}), 400
+        
+        input_video_path = os.path.join(INPUT_FOLDER, filename)
+        with open(input_video_path, 'wb') as f:
+            shutil.copyfileobj(request.stream, f, length=1 << 20)
+        
+        return run_pose_extraction(input_video_path)
+    
     except Exception as e:
         print(f"Error: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -119,7 +226,8 @@ def extract_pose():
 def animate_character():
     """
     Module 2: Apply pose data to Mixamo character using Blender
-    Runs auto_oneclick.py via Blender in background mode
+    Queues auto_oneclick.py via Blender in background mode and returns a
+    job id; poll /animate-status/<job_id> for the result
     """
     try:
         if 'character_fbx' not in request.files:
@@ -133,18 +241,11 @@ def animate_character():
         if not allowed_file(character_fbx.filename):
             return jsonify({'error': 'Invalid file type. Only FBX supported'}), 400
         
-        # Check if pose_data.json exists (from Module 1)
-        pose_json_path = os.path.join(OUTPUT_FOLDER, 'pose_data.json')
-        if not os.path.exists(pose_json_path):
+        # Check if pose data exists (from Module 1)
+        if not any(os.path.exists(os.path.join(OUTPUT_FOLDER, name))
+                   for name in ('pose_data.npy', 'pose_data.json')):
             return jsonify({'error': 'Pose data not found. Please run Module 1 first.'}), 400
         
-        # Save character FBX to assets folder
-        character_filename = secure_filename(character_fbx.filename)
-        character_path = os.path.join(ASSETS_FOLDER, 'character.fbx')
-        character_fbx.save(character_path)
-        
-        print(f"🎭 Character saved to: {character_path}")
-        
         # Check if Blender script exists
         blender_script = os.path.join(BLENDER_FOLDER, 'auto_oneclick.py')
         if not os.path.exists(blender_script):
@@ -159,23 +260,171 @@ def animate_character():
         
         print(f"🎨 Using Blender: {blender_exe}")
         
-        # Verify Blender works by checking version
-        try:
-            version_check = subprocess.run(
-                [blender_exe, '--version'],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            if version_check.returncode != 0:
-                return jsonify({'error': 'Blender executable not working'}), 500
-            print(f"✅ Blender version check passed")
-        except Exception as e:
-            print(f"❌ Blender version check failed: {e}")
-            return jsonify({'error': f'Blender executable not working: {e}'}), 500
+        # Version probe result is cached, so no extra Blender launch per request
+        if not blender_works():
+            return jsonify({'error': 'Blender executable not working'}), 500
+        
+        job_id = uuid.uuid4().hex
+        
+        # Save character FBX per job; the job moves it to assets/character.fbx
+        # when it runs, so a later upload cannot replace it under a queued job
+        character_filename = secure_filename(character_fbx.filename)
+        character_path = os.path.join(ASSETS_FOLDER, f'character_{job_id}.fbx')
+        store_upload(character_fbx, character_path)
         
-        print("🔄 Running Blender animation pipeline...")
+        print(f"🎭 Character saved to: {character_path}")
+        
+        prune_animate_jobs()
+        future = BLENDER_EXECUTOR.submit(
+            run_blender_job, blender_exe, blender_script, character_filename, character_path
+        )
+        future.add_done_callback(lambda f: setattr(f, 'finished_at', time.monotonic()))
+        ANIMATE_JOBS[job_id] = future
+        print(f"📨 Animation job queued: {job_id}")
         
+        return jsonify({
+            'success': True,
+            'message': 'Character animation started',
+            'job_id': job_id,
+            'status': 'queued'
+        }), 202
+    
+    except Exception as e:
+        print(f"❌ Error in animate_character: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/animate-status/<job_id>')
+def animate_status(job_id):
+    """Poll a background animation job started by /animate-character"""
+    future = ANIMATE_JOBS.get(job_id)
+    if future is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    
+    if not future.done():
+        return jsonify({'job_id': job_id, 'status': 'running' if future.running() else 'queued'})
+    
+    try:
+        response_data = future.result()
+    except subprocess.TimeoutExpired:
+        return jsonify({'job_id': job_id, 'status': 'failed', 'error': 'Animation timed out (>10 minutes)'}), 500
+    except Exception as e:
+        return jsonify({'job_id': job_id, 'status': 'failed', 'error': str(e)}), 500
+    
+    return jsonify(dict(response_data, job_id=job_id, status='done'))
+
+def _start_blender_worker(blender_exe):
+    proc = subprocess.Popen(
+        [blender_exe, '--background', '--python', os.path.join(BLENDER_FOLDER, 'blender_rpc.py')],
+        cwd=BASE_DIR,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,  # one pipe to drain, so the worker never blocks on a full one
+        text=True,
+        encoding='utf-8',
+        errors='replace',
+        bufsize=1
+    )
+    lines = queue.Queue()
+    
+    def pump():
+        for line in proc.stdout:
+            lines.put(line)
+        lines.put(None)
+    
+    threading.Thread(target=pump, daemon=True).start()
+    return proc, lines
+
+def _stop_blender_worker():
+    global _blender_proc, _blender_lines
+    proc, _blender_proc, _blender_lines = _blender_proc, None, None
+    if proc is None or proc.poll() is not None:
+        return
+    try:
+        proc.stdin.close()  # worker exits at end of input
+        proc.wait(timeout=10)
+    except Exception:
+        proc.kill()
+
+def _read_blender_reply(lines, timeout):
+    """Collect worker output up to its next reply line; returns (reply, log text)."""
+    deadline = time.monotonic() + timeout
+    log = []
+    while True:
+        try:
+            line = lines.get(timeout=max(deadline - time.monotonic(), 0))
+        except queue.Empty:
+            raise RuntimeError('Blender worker timed out:\n' + ''.join(log[-50:]))
+        if line is None:
+            raise RuntimeError('Blender worker exited:\n' + ''.join(log[-50:]))
+        if line.startswith(BLENDER_RPC_PREFIX):
+            return json.loads(line[len(BLENDER_RPC_PREFIX):]), ''.join(log)
+        log.append(line)
+
+def blender_rpc(blender_exe, request_data, timeout=600):
+    """
+    Send one request to the persistent Blender worker, starting it (again) if it
+    is not running. Returns (reply, log text); a worker that crashes or times
+    out is discarded so the next call gets a fresh one.
+    """
+    global _blender_proc, _blender_lines, _blender_restart_pending
+    with BLENDER_RPC_LOCK:
+        if _blender_restart_pending:
+            _blender_restart_pending = False
+            _stop_blender_worker()
+        try:
+            if _blender_proc is None or _blender_proc.poll() is not None:
+                print(f"🚀 Starting persistent Blender worker: {blender_exe}")
+                _blender_proc, _blender_lines = _start_blender_worker(blender_exe)
+                _read_blender_reply(_blender_lines, timeout=120)  # ready line
+            _blender_proc.stdin.write(json.dumps(request_data) + '\n')
+            _blender_proc.stdin.flush()
+            return _read_blender_reply(_blender_lines, timeout)
+        except Exception:
+            _stop_blender_worker()
+            raise
+
+def stop_blender_worker():
+    with BLENDER_RPC_LOCK:
+        _stop_blender_worker()
+
+def restart_blender_worker():
+    """
+    Drop the worker so the next job starts a fresh one: right away if it is
+    idle, otherwise once the running job finishes. Never waits for a job.
+    Returns True if the worker was stopped now.
+    """
+    global _blender_restart_pending
+    if not BLENDER_RPC_LOCK.acquire(blocking=False):
+        _blender_restart_pending = True
+        return False
+    try:
+        _stop_blender_worker()
+    finally:
+        BLENDER_RPC_LOCK.release()
+    return True
+
+atexit.register(stop_blender_worker)
+
+def run_blender_job(blender_exe, blender_script, character_filename, character_path):
+    """
+    Background worker for /animate-character: runs auto_oneclick.py in Blender
+    and returns the response data, raising RuntimeError on failure.
+    """
+    # Jobs run one at a time, so this job owns assets/character.fbx until it returns
+    os.replace(character_path, os.path.join(ASSETS_FOLDER, 'character.fbx'))
+    
+    print("🔄 Running Blender animation pipeline...")
+    
+    if BLENDER_PERSISTENT:
+        # Warm worker: no Blender startup per job
+        reply, log = blender_rpc(blender_exe, {'script': blender_script})
+        if not reply.get('ok'):
+            print(f"❌ Blender failed: {reply.get('error')}")
+            print(f"Blender output: {log}")
+            raise RuntimeError(f"Animation failed: {reply.get('error')}")
+        print(f"✅ Blender completed successfully")
+        print(f"Blender output: {log}")
+    else:
         # Run Blender with full path and proper arguments
         result = subprocess.run(
             [
@@ -194,81 +443,75 @@ def animate_character():
             print(f"❌ Blender failed with return code: {result.returncode}")
             print(f"Blender stderr: {result.stderr}")
             print(f"Blender stdout: {result.stdout}")
-            return jsonify({'error': f'Animation failed: {result.stderr}'}), 500
+            raise RuntimeError(f'Animation failed: {result.stderr}')
         
         print(f"✅ Blender completed successfully")
         print(f"Blender output: {result.stdout}")
-        
-        # Check what files were actually generated
-        print("📁 Checking output folder contents:")
-        output_files = os.listdir(OUTPUT_FOLDER)
+    
+    # Check what files were actually generated
+    print("📁 Checking output folder contents:")
+    output_files = os.listdir(OUTPUT_FOLDER)
+    for file in output_files:
+        print(f"   - {file}")
+    
+    # Look for common output file patterns
+    possible_fbx_files = [
+        'skinned_animation.fbx',
+        'animated_character.fbx', 
+        'character_animation.fbx',
+        'output.fbx',
+        'animation.fbx'
+    ]
+    
+    animated_fbx = None
+    for fbx_file in possible_fbx_files:
+        potential_path = os.path.join(OUTPUT_FOLDER, fbx_file)
+        if os.path.exists(potential_path):
+            animated_fbx = fbx_file
+            print(f"✅ Found animated FBX: {animated_fbx}")
+            break
+    
+    if not animated_fbx:
+        # Try to find any .fbx file in output folder
         for file in output_files:
-            print(f"   - {file}")
-        
-        # Look for common output file patterns
-        possible_fbx_files = [
-            'skinned_animation.fbx',
-            'animated_character.fbx', 
-            'character_animation.fbx',
-            'output.fbx',
-            'animation.fbx'
-        ]
-        
-        animated_fbx = None
-        for fbx_file in possible_fbx_files:
-            potential_path = os.path.join(OUTPUT_FOLDER, fbx_file)
-            if os.path.exists(potential_path):
-                animated_fbx = fbx_file
-                print(f"✅ Found animated FBX: {animated_fbx}")
+            if file.endswith('.fbx'):
+                animated_fbx = file
+                print(f"✅ Found FBX file: {animated_fbx}")
                 break
-        
-        if not animated_fbx:
-            # Try to find any .fbx file in output folder
-            for file in output_files:
-                if file.endswith('.fbx'):
-                    animated_fbx = file
-                    print(f"✅ Found FBX file: {animated_fbx}")
-                    break
-        
-        if not animated_fbx:
-            return jsonify({'error': 'No animated FBX file was generated. Check Blender script output.'}), 500
-        
-        # Look for MP4 file
-        animated_mp4 = None
-        possible_mp4_files = ['anim.mp4', 'animation.mp4', 'output.mp4', 'render.mp4']
-        for mp4_file in possible_mp4_files:
-            potential_path = os.path.join(OUTPUT_FOLDER, mp4_file)
-            if os.path.exists(potential_path):
-                animated_mp4 = mp4_file
-                print(f"✅ Found MP4: {animated_mp4}")
+    
+    if not animated_fbx:
+        raise RuntimeError('No animated FBX file was generated. Check Blender script output.')
+    
+    # Look for MP4 file
+    animated_mp4 = None
+    possible_mp4_files = ['anim.mp4', 'animation.mp4', 'output.mp4', 'render.mp4']
+    for mp4_file in possible_mp4_files:
+        potential_path = os.path.join(OUTPUT_FOLDER, mp4_file)
+        if os.path.exists(potential_path):
+            animated_mp4 = mp4_file
+            print(f"✅ Found MP4: {animated_mp4}")
+            break
+    
+    # If no standard MP4 found, look for any MP4
+    if not animated_mp4:
+        for file in output_files:
+            if file.endswith('.mp4'):
+                animated_mp4 = file
+                print(f"✅ Found MP4 file: {animated_mp4}")
                 break
-        
-        # If no standard MP4 found, look for any MP4
-        if not animated_mp4:
-            for file in output_files:
-                if file.endswith('.mp4'):
-                    animated_mp4 = file
-                    print(f"✅ Found MP4 file: {animated_mp4}")
-                    break
-        
-        response_data = {
-            'success': True,
-            'message': 'Character animation completed successfully',
-            'animated_fbx': animated_fbx,
-            'character_used': character_filename,
-            'output_files': output_files  # For debugging
-        }
-        
-        if animated_mp4:
-            response_data['animated_mp4'] = animated_mp4
-        
-        return jsonify(response_data)
     
-    except subprocess.TimeoutExpired:
-        return jsonify({'error': 'Animation timed out (>10 minutes)'}), 500
-    except Exception as e:
-        print(f"❌ Error in animate_character: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+    response_data = {
+        'success': True,
+        'message': 'Character animation completed successfully',
+        'animated_fbx': animated_fbx,
+        'character_used': character_filename,
+        'output_files': output_files  # For debugging
+    }
+    
+    if animated_mp4:
+        response_data['animated_mp4'] = animated_mp4
+    
+    return response_data
 
 @app.route('/download/<filename>')
 def download_file(filename):
@@ -281,29 +524,82 @@ def download_file(filename):
         print(f"📥 Download request for: {filename}")
         print(f"📁 Checking path: {file_path}")
         
-        if not os.path.exists(file_path):
+        # Pose data is stored as .npy; JSON is only materialized on request, and
+        # always from the .npy so it matches what Blender animates (any
+        # pose_data.json on disk is a leftover of the old text format)
+        npy_path = os.path.join(OUTPUT_FOLDER, 'pose_data.npy')
+        if filename == 'pose_data.json' and os.path.exists(npy_path):
+            return Response(
+                pose_to_json(np.load(npy_path, mmap_mode='r')),
+                mimetype='application/json',
+                headers={'Content-Disposition': f'attachment; filename={filename}'}
+            )
+        
+        # One stat for existence, type, size and mtime
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
             print(f"❌ File not found: {file_path}")
             return jsonify({'error': f'File not found: {filename}'}), 404
         
-        if not os.path.isfile(file_path):
+        if not stat.S_ISREG(st.st_mode):
             print(f"❌ Not a file: {file_path}")
             return jsonify({'error': f'Not a file: {filename}'}), 400
         
-        file_size = os.path.getsize(file_path)
-        print(f"✅ File found: {filename} ({file_size} bytes)")
+        print(f"✅ File found: {filename} ({st.st_size} bytes)")
+        
+        if X_ACCEL_PREFIX:
+            # nginx streams the file itself via sendfile(2)
+            return Response(headers={
+                'X-Accel-Redirect': X_ACCEL_PREFIX.rstrip('/') + '/' + filename,
+                'Content-Type': 'application/octet-stream',
+                'Content-Disposition': f'attachment; filename={filename}'
+            })
         
-        # Send file with proper headers
-        return send_file(
+        # Send file with proper headers; conditional enables Range requests
+        # so video players can seek
+        response = send_file(
             file_path,
             as_attachment=True,
             download_name=filename,
-            mimetype='application/octet-stream'
+            mimetype='application/octet-stream',
+            conditional=True,
+            etag=f"{st.st_mtime_ns:x}-{st.st_size:x}",
+            last_modified=st.st_mtime
         )
+        response.headers['Accept-Ranges'] = 'bytes'
+        return response
         
     except Exception as e:
         print(f"❌ Download error: {str(e)}")
         return jsonify({'error': f'Download failed: {str(e)}'}), 500
 
+# Cheapest first: remux without re-encoding, then GPU encode, then CPU encode
+FFMPEG_MP4_ATTEMPTS = [
+    ['-c', 'copy'],
+    ['-c:v', 'h264_nvenc', '-preset', 'p1', '-c:a', 'aac'],
+    ['-c:v', 'libx264', '-preset', 'fast'],
+]
+
+def convert_to_mp4(src_path, mp4_path):
+    """Convert src_path to mp4_path with ffmpeg; False if every attempt failed."""
+    for codec_args in FFMPEG_MP4_ATTEMPTS:
+        try:
+            result = subprocess.run(
+                ['ffmpeg', '-y', '-i', src_path, *codec_args, mp4_path],
+                capture_output=True,
+                timeout=60
+            )
+        except FileNotFoundError:
+            return False  # no ffmpeg at all
+        except subprocess.TimeoutExpired:
+            continue
+        if result.returncode == 0:
+            return True
+    if os.path.exists(mp4_path):
+        os.remove(mp4_path)
+    return False
+
 @app.route('/webcam-capture', methods=['POST'])
 def webcam_capture():
     """
@@ -316,26 +612,18 @@ def webcam_capture():
         video_data = request.files['video']
         filename = 'webcam_capture_' + str(int(time.time())) + '.webm'
         video_path = os.path.join(INPUT_FOLDER, filename)
-        video_data.save(video_path)
+        store_upload(video_data, video_path)
         
         # Convert webm to mp4 using ffmpeg if available
         mp4_filename = filename.replace('.webm', '.mp4')
         mp4_path = os.path.join(INPUT_FOLDER, mp4_filename)
         
-        try:
-            result = subprocess.run(
-                ['ffmpeg', '-i', video_path, '-c:v', 'libx264', '-preset', 'fast', mp4_path],
-                capture_output=True,
-                timeout=60
-            )
-            if result.returncode == 0:
-                os.remove(video_path)  # Remove webm
-                filename = mp4_filename
-                print(f"✅ Converted webcam capture to MP4: {mp4_filename}")
-            else:
-                print(f"⚠️ FFmpeg conversion failed, keeping webm format")
-        except (subprocess.TimeoutExpired, FileNotFoundError):
-            print(f"⚠️ FFmpeg not available or timed out, keeping webm format")
+        if convert_to_mp4(video_path, mp4_path):
+            os.remove(video_path)  # Remove webm
+            filename = mp4_filename
+            print(f"✅ Converted webcam capture to MP4: {mp4_filename}")
+        else:
+            print(f"⚠️ FFmpeg conversion failed or unavailable, keeping webm format")
         
         return jsonify({
             'success': True,
@@ -346,31 +634,77 @@ def webcam_capture():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@functools.lru_cache(maxsize=1)
 def find_blender_executable():
-    """Try to find Blender executable in common locations"""
+    """Try to find Blender executable in common locations (cached; see /reload-blender)"""
     # Check environment variable first
     blender_path = os.environ.get('BLENDER_PATH')
-    if blender_path and os.path.exists(blender_path):
+    if blender_path and os.path.isfile(blender_path):
         return blender_path
     
     # Check if 'blender' is in PATH
     if shutil.which('blender'):
         return 'blender'
     
-    # Common installation paths
-    common_paths = [
-        r"C:\Program Files\Blender Foundation\Blender 4.5\blender.exe",
-        r"C:\Program Files\Blender Foundation\Blender\blender.exe",
-        r"C:\Program Files (x86)\Blender Foundation\Blender\blender.exe",
-        os.path.expanduser(r"~\AppData\Local\Programs\Blender Foundation\Blender\blender.exe"),
+    # Common installation roots; one directory listing each, newest version first
+    install_roots = [
+        r"C:\Program Files\Blender Foundation",
+        r"C:\Program Files (x86)\Blender Foundation",
+        os.path.expanduser(r"~\AppData\Local\Programs\Blender Foundation"),
     ]
     
-    for path in common_paths:
-        if os.path.exists(path):
-            return path
+    for root in install_roots:
+        try:
+            with os.scandir(root) as entries:
+                versions = sorted(
+                    (e for e in entries if e.name.startswith('Blender') and e.is_dir()),
+                    key=lambda e: [int(t) if t.isdigit() else t for t in re.split(r'(\d+)', e.name)],
+                    reverse=True
+                )
+        except OSError:
+            continue
+        for entry in versions:
+            path = os.path.join(entry.path, 'blender.exe')
+            if os.path.isfile(path):
+                return path
     
     return None
 
+@functools.lru_cache(maxsize=1)
+def blender_works():
+    """Check once that the Blender executable runs (`--version`); cached"""
+    blender_exe = find_blender_executable()
+    if not blender_exe:
+        return False
+    try:
+        version_check = subprocess.run(
+            [blender_exe, '--version'],
+            capture_output=True,
+            text=True,
+            timeout=30
+        )
+    except Exception as e:
+        print(f"❌ Blender version check failed: {e}")
+        return False
+    if version_check.returncode != 0:
+        return False
+    print(f"✅ Blender version check passed")
+    return True
+
+@app.route('/reload-blender', methods=['POST'])
+@auth.login_required
+def reload_blender():
+    """Forget the cached Blender lookup/version check, e.g. after reinstalling Blender"""
+    find_blender_executable.cache_clear()
+    blender_works.cache_clear()
+    # Restarted with the new executable on the next job; a running job is not interrupted
+    restarted = restart_blender_worker()
+    return jsonify({
+        'blender_path': find_blender_executable(),
+        'blender_ok': blender_works(),
+        'worker_restart': 'done' if restarted else 'after current job'
+    })
+
 @app.route('/status')
 def status():
     """Check if all required components are available"""
@@ -420,11 +754,21 @@ if __name__ == '__main__':
     extract_exists = os.path.exists(os.path.join(BASE_DIR, 'extract_pose.py'))
     blender_exists = os.path.exists(os.path.join(BLENDER_FOLDER, 'auto_oneclick.py'))
     blender_exe = find_blender_executable()
+    # The debug reloader runs this block twice: in a watcher process that never
+    # serves and in the serving child (WERKZEUG_RUN_MAIN=true). Warm up only the latter
+    serving = os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+    blender_ok = None
+    if serving:
+        blender_ok = blender_works()  # warm the cached version probe before serving
+        with POSE_LOCK:
+            get_pose()  # load MediaPipe before the first request
     
     print("\n📋 Component Check:")
     print(f"   extract_pose.py: {'✅' if extract_exists else '❌'}")
     print(f"   auto_oneclick.py: {'✅' if blender_exists else '❌'}")
     print(f"   Blender: {'✅ ' + blender_exe if blender_exe else '❌ Not Found'}")
+    if blender_exe and blender_ok is False:
+        print("   ⚠️  Blender found but `--version` failed")
     
     if not extract_exists:
         print("\n⚠️  WARNING: extract_pose.py not found!")
@@ -433,6 +777,10 @@ if __name__ == '__main__':
     if not blender_exe:
         print("\n⚠️  WARNING: Blender not found! Install Blender 4.x or set BLENDER_PATH")
     
+    # Boot the persistent Blender worker ahead of the first job (serving process only)
+    if BLENDER_PERSISTENT and blender_ok:
+        BLENDER_EXECUTOR.submit(blender_rpc, blender_exe, {'op': 'ping'})
+    
     print("\n🚀 Starting Flask server on http://127.0.0.1:5000")
     print("="*60 + "\n")
     
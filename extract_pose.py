@@ -1,79 +1,431 @@
 import cv2
-import mediapipe as mp
+import io
 import json
+import mediapipe as mp
+import numpy as np
 import os
+import queue
 import sys
+import threading
 
-def main():
-    # Get video path from command line argument or use default
-    if len(sys.argv) > 1:
-        video_path = sys.argv[1]
-    else:
-        video_path = "input/vid6.mp4"
+try:
+    import orjson  # optional: C JSON encoder for on-demand JSON export
+except ImportError:
+    orjson = None
+
+try:
+    import av  # optional: PyAV decode (hardware when available), RGB straight from the decoder
+except ImportError:
+    av = None
+
+NUM_LANDMARKS = 33  # BlazePose landmark count
+
+# Optional MediaPipe Tasks model (e.g. pose_landmarker_lite.task from the MediaPipe model zoo)
+POSE_MODEL_PATH = os.environ.get(
+    'POSE_MODEL_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'pose_landmarker.task')
+)
+
+# 0 = BlazePose Lite (fast), 1 = Full; set POSE_COMPLEXITY=1 when quality matters
+POSE_COMPLEXITY = int(os.environ.get('POSE_COMPLEXITY', '0'))
+
+# PyAV hardware decoder device ('cuda', 'vaapi', 'videotoolbox', ...); empty for CPU decode
+VIDEO_HWACCEL = os.environ.get('VIDEO_HWACCEL', 'cuda')
+
+# Frames are downscaled (aspect kept) so the longer side is at most this many
+# pixels before MediaPipe sees them; 0 keeps the source resolution. Landmarks are
+# normalized, so no post-transform is needed. BlazePose works on 256 px crops of
+# the person, so going much below ~2x that costs accuracy for small subjects.
+POSE_INPUT_MAX_SIDE = int(os.environ.get('POSE_INPUT_MAX_SIDE', '480'))
+
+# Decoded frames buffered ahead of inference by the decoder thread
+FRAME_QUEUE_SIZE = 4
+
+# OpenCV work (decode, resize, colour convert) already runs on its own thread
+# beside inference; keep its internal pool from competing with MediaPipe's
+# XNNPACK threads for the same cores
+cv2.setNumThreads(int(os.environ.get('OPENCV_THREADS', '1')))
+
+# VIDEO-mode timestamps must keep increasing for the lifetime of a landmarker,
+# so successive videos continue from where the previous one stopped
+_video_clock_ms = 0
+
+def create_pose(model_complexity=POSE_COMPLEXITY, smooth_landmarks=False, **solution_kwargs):
+    """
+    Build a pose detector; callers keep it and reuse it across videos.
+    Uses the Tasks PoseLandmarker in VIDEO mode when a .task model is available,
+    otherwise the legacy solutions graph (arguments go to Pose()). Smoothing is
+    off by default because Blender/auto_oneclick.py runs its own moving average.
+    """
+    if os.path.exists(POSE_MODEL_PATH):
+        from mediapipe.tasks.python import BaseOptions, vision
+        options = vision.PoseLandmarkerOptions(
+            # CPU delegate runs the model through TFLite's XNNPACK kernels
+            base_options=BaseOptions(model_asset_path=POSE_MODEL_PATH,
+                                     delegate=BaseOptions.Delegate.CPU),
+            running_mode=vision.RunningMode.VIDEO,
+            num_poses=1
+        )
+        return vision.PoseLandmarker.create_from_options(options)
+    return mp.solutions.pose.Pose(
+        model_complexity=model_complexity,
+        smooth_landmarks=smooth_landmarks,
+        **solution_kwargs
+    )
+
+def _landmark_layout(n_fields):
+    """
+    Wire layout of one serialized NormalizedLandmark with every field set:
+    a 2-byte length-delimited header, then n_fields x (1-byte tag + float32).
+    Returns (record dtype, offsets of the tag/header bytes, their expected values).
+    """
+    names = ('x', 'y', 'z', 'visibility', 'presence')[:n_fields]
+    size = 2 + 5 * n_fields
+    dtype = np.dtype({
+        'names': names,
+        'formats': ['<f4'] * n_fields,
+        'offsets': [3 + 5 * i for i in range(n_fields)],
+        'itemsize': size
+    })
+    offsets = [0, 1] + [2 + 5 * i for i in range(n_fields)]
+    expected = [0x0a, size - 2] + [(i + 1) << 3 | 5 for i in range(n_fields)]  # fixed32 fields 1..n
+    return dtype, np.array(offsets), np.array(expected, dtype=np.uint8)
+
+# Serialized landmark size -> layout (older MediaPipe has no presence field)
+_LANDMARK_LAYOUTS = {2 + 5 * n: _landmark_layout(n) for n in (4, 5)}
+
+def _landmarks_from_proto(landmark_list):
+    """
+    (33, 4) float32 x/y/z/visibility straight from the serialized
+    NormalizedLandmarkList, without touching each landmark in Python.
+    Falls back to attribute access if the wire layout is not the fixed one.
+    """
+    buf = landmark_list.SerializeToString()
+    size, rem = divmod(len(buf), NUM_LANDMARKS)
+    layout = _LANDMARK_LAYOUTS.get(size) if rem == 0 else None
+    if layout is not None:
+        dtype, offsets, expected = layout
+        raw = np.frombuffer(buf, dtype=np.uint8).reshape(NUM_LANDMARKS, size)
+        if (raw[:, offsets] == expected).all():
+            rec = np.frombuffer(buf, dtype=dtype)
+            out = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+            for i, name in enumerate(('x', 'y', 'z', 'visibility')):
+                out[:, i] = rec[name]
+            return out
+    return _landmarks_from_objects(landmark_list.landmark)
+
+def _landmarks_from_objects(landmarks):
+    return np.fromiter(
+        (v for p in landmarks for v in (p.x, p.y, p.z, p.visibility)),
+        dtype=np.float32, count=NUM_LANDMARKS * 4
+    ).reshape(NUM_LANDMARKS, 4)
+
+def detect_landmarks(pose, rgb_frame, timestamp_ms):
+    """(33, 4) x/y/z/visibility for one RGB frame from either backend, or None if no pose was found."""
+    if isinstance(pose, mp.solutions.pose.Pose):
+        results = pose.process(rgb_frame)
+        return _landmarks_from_proto(results.pose_landmarks) if results.pose_landmarks else None
+    image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+    result = pose.detect_for_video(image, timestamp_ms)
+    return _landmarks_from_objects(result.pose_landmarks[0]) if result.pose_landmarks else None
+
+def _open_av(video_path):
+    """PyAV container with a hardware decoder if one initialises, else plain CPU decode."""
+    if VIDEO_HWACCEL:
+        try:
+            from av.codec.hwaccel import HWAccel
+            return av.open(video_path, hwaccel=HWAccel(
+                device_type=VIDEO_HWACCEL, allow_software_fallback=True))
+        except Exception:
+            pass  # older PyAV or no such device
+    return av.open(video_path)
+
+def _input_size(width, height):
+    """(width, height) to feed MediaPipe, or None to keep the frame as decoded."""
+    longest = max(width, height)
+    if not POSE_INPUT_MAX_SIDE or longest <= POSE_INPUT_MAX_SIDE:
+        return None
+    scale = POSE_INPUT_MAX_SIDE / longest
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def _av_frames(container, stream):
+    # The scaler runs as part of the rgb24 conversion, so resizing costs no extra pass
+    size = _input_size(stream.width, stream.height) if stream.width else None
+    scale = {'width': size[0], 'height': size[1]} if size else {}
+    try:
+        for frame in container.decode(stream):
+            rgb = frame.to_ndarray(format='rgb24', **scale)
+            # Display-matrix rotation (portrait phone clips), as OpenCV's auto-rotate does;
+            # frame.rotation is counterclockwise degrees, like np.rot90
+            k = round(frame.rotation / 90) % 4
+            yield np.ascontiguousarray(np.rot90(rgb, k)) if k else rgb
+    finally:
+        container.close()
+
+def _cv2_frames(cap):
+    # Decode buffer is reused; RGB buffers rotate through a ring that covers every
+    # frame alive at once (queued + being put + in inference)
+    # Large frames are resized first so the colour conversion touches fewer pixels
+    frame = None
+    small = None
+    size = None
+    rgb_ring = None
+    i = 0
+    try:
+        while True:
+            ret, frame = cap.read(frame)
+            if not ret:
+                break
+            if rgb_ring is None:
+                size = _input_size(frame.shape[1], frame.shape[0])
+                if size:
+                    small = np.empty((size[1], size[0], 3), dtype=frame.dtype)
+                shape = small.shape if size else frame.shape
+                rgb_ring = [np.empty(shape, dtype=frame.dtype) for _ in range(FRAME_QUEUE_SIZE + 2)]
+            if size:
+                cv2.resize(frame, size, dst=small, interpolation=cv2.INTER_AREA)
+            rgb = rgb_ring[i % len(rgb_ring)]
+            cv2.cvtColor(small if size else frame, cv2.COLOR_BGR2RGB, dst=rgb)
+            yield rgb
+            i += 1
+    finally:
+        cap.release()
+
+def open_video(video_path):
+    """
+    Open `video_path` for decoding.
+    Returns (frames, fps, n_frames): a generator of RGB uint8 frames (close it
+    to release the file), the frame rate, and the container's frame count
+    (0 if unknown). Uses PyAV when installed, otherwise OpenCV. PyAV builds
+    without VideoFrame.rotation cannot honour rotated (portrait) streams, so
+    those go through OpenCV, which auto-rotates.
+    """
+    if av is not None and hasattr(av.VideoFrame, 'rotation'):
+        try:
+            container = _open_av(video_path)
+            stream = container.streams.video[0]
+        except Exception:
+            pass  # unreadable for PyAV; let OpenCV try
+        else:
+            stream.thread_type = 'AUTO'
+            fps = float(stream.average_rate or 30.0)
+            return _av_frames(container, stream), fps, stream.frames
+    
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError("Cannot open video: " + video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    return _cv2_frames(cap), fps, n_frames
+
+def _put(frame_queue, item, stop):
+    """Blocking put that gives up once `stop` is set; returns False if it gave up."""
+    while not stop.is_set():
+        try:
+            frame_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def _decode_worker(frames, frame_queue, stop):
+    """Decoder thread: queue every frame, then None (or the decode error)."""
+    end = None
+    try:
+        for rgb in frames:
+            if not _put(frame_queue, rgb, stop):
+                return
+    except Exception as e:
+        end = e
+    finally:
+        frames.close()
+    _put(frame_queue, end, stop)
+
+def fill_missing_frames(pose_arr):
+    """
+    Linearly interpolate NaN (undetected) frames from the nearest detected
+    frames on either side, holding the first/last detection at the edges.
+    Filled frames get visibility 0 so downstream can tell them apart.
+    Returns the boolean per-frame detection mask.
+    """
+    detected = ~np.isnan(pose_arr[:, 0, 0])
+    if detected.all() or not detected.any():
+        return detected
+    
+    t = np.arange(len(pose_arr))
+    known = t[detected]
+    nxt = np.searchsorted(known, t)
+    hi = known[np.minimum(nxt, len(known) - 1)]
+    lo = known[np.maximum(nxt - 1, 0)]
+    w = np.clip((t - lo) / np.maximum(hi - lo, 1), 0.0, 1.0)[:, None, None]
+    
+    # Only the missing rows are computed, so the temporaries stay gap-sized
+    missing = ~detected
+    w = w[missing]
+    pose_arr[missing] = (1.0 - w) * pose_arr[lo[missing]] + w * pose_arr[hi[missing]]
+    pose_arr[missing, :, 3] = 0.0
+    return detected
+
+def _npy_header(n_frames):
+    # numpy leaves room in the header for the shape to grow, so the placeholder
+    # written before streaming can be overwritten in place with the final count
+    buf = io.BytesIO()
+    np.lib.format.write_array_header_1_0(buf, {
+        'descr': np.dtype(np.float32).str,
+        'fortran_order': False,
+        'shape': (n_frames, NUM_LANDMARKS, 4)
+    })
+    return buf.getvalue()
+
+def _finish_streamed(part_path, output_path, frame_count):
+    """
+    Finalize a streamed .npy: patch the frame count into the header, fill
+    missing frames in place and move it to output_path. Nothing is moved
+    (and the partial file is removed) if no frame had a pose.
+    """
+    header = _npy_header(frame_count)
+    if len(header) != len(_npy_header(0)):  # would overwrite the first frames
+        os.remove(part_path)
+        raise RuntimeError("Pose output header size changed")
+    with open(part_path, 'r+b') as f:
+        f.write(header)
     
-    output_path = "output/pose_data.json"
+    if frame_count:
+        pose_arr = np.load(part_path, mmap_mode='r+')
+        detected = fill_missing_frames(pose_arr)
+        pose_arr.flush()
+        del pose_arr  # unmap before renaming/removing (required on Windows)
+    else:
+        detected = np.zeros(0, dtype=bool)
     
+    if not detected.any():
+        os.remove(part_path)
+        return np.full((frame_count, NUM_LANDMARKS, 4), np.nan, dtype=np.float32), detected
+    os.replace(part_path, output_path)
+    return np.load(output_path, mmap_mode='r'), detected
+
+def run_extraction(video_path, pose, output_path=None):
+    """
+    Run `pose` over every frame of `video_path`.
+    Returns (pose_arr, detected): a (frames, 33, 4) float32 array of
+    x/y/z/visibility with undetected frames interpolated, and the
+    per-frame detection mask.
+    With output_path, frames are streamed to that .npy as they are
+    processed (memory stays flat for long videos) and pose_arr is a
+    read-only memory map of it; the file is only written if a pose was found.
+    """
+    global _video_clock_ms
     print("Starting pose extraction from: " + video_path)
     
     # Check if video exists
     if not os.path.exists(video_path):
-        print("ERROR: Video file not found: " + video_path)
-        return False
+        raise FileNotFoundError("Video file not found: " + video_path)
     
-    # Initialize MediaPipe Pose
-    mp_pose = mp.solutions.pose
-    pose = mp_pose.Pose()
+    # A reused graph still tracks the previous video; start clean
+    if isinstance(pose, mp.solutions.pose.Pose):
+        pose.reset()
     
     # Open video
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        print("ERROR: Cannot open video")
-        return False
+    frames, fps, n_frames = open_video(video_path)
     
-    pose_data = []
+    # Structure-of-arrays output; NaN rows mark frames with no pose
+    if output_path is None:
+        # In memory, allocated once
+        pose_arr = np.full((max(n_frames, 1), NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+        out = None
+    else:
+        # One fixed-size record per frame appended to a .npy with a placeholder header
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        part_path = output_path + '.part'
+        out = open(part_path, 'wb')
+        out.write(_npy_header(0))
+    missing_row = np.full((NUM_LANDMARKS, 4), np.nan, dtype=np.float32).tobytes()
     frame_count = 0
     
+    # Decode on a background thread so it overlaps with inference
+    # (MediaPipe releases the GIL while the graph runs)
+    frame_queue = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
+    stop = threading.Event()
+    decoder = threading.Thread(target=_decode_worker, args=(frames, frame_queue, stop), daemon=True)
+    decoder.start()
+    
     try:
         while True:
-            ret, frame = cap.read()
-            if not ret:
+            rgb_frame = frame_queue.get()
+            if rgb_frame is None:
                 break
-                
-            # Convert and process
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = pose.process(rgb_frame)
+            if isinstance(rgb_frame, Exception):
+                raise rgb_frame
             
-            if results.pose_landmarks:
-                frame_landmarks = []
-                for landmark in results.pose_landmarks.landmark:
-                    frame_landmarks.append({
-                        'x': float(landmark.x),
-                        'y': float(landmark.y), 
-                        'z': float(landmark.z),
-                        'visibility': float(landmark.visibility)
-                    })
-                pose_data.append(frame_landmarks)
+            timestamp_ms = _video_clock_ms + int(frame_count * 1000.0 / fps)
+            landmarks = detect_landmarks(pose, rgb_frame, timestamp_ms)
+            
+            if out is not None:
+                out.write(landmarks.tobytes() if landmarks is not None else missing_row)
             else:
-                pose_data.append([])
+                if frame_count == len(pose_arr):  # container under-reported its length
+                    pose_arr = np.concatenate([pose_arr, np.full_like(pose_arr, np.nan)])
+                
+                if landmarks is not None:
+                    pose_arr[frame_count] = landmarks
             
             frame_count += 1
             if frame_count % 30 == 0:
                 print("Frames processed: " + str(frame_count))
-                
+    except BaseException:
+        if out is not None:
+            out.close()
+            os.remove(part_path)
+        raise
+    finally:
+        stop.set()
+        decoder.join()
+        _video_clock_ms += int(frame_count * 1000.0 / fps) + 1
+    
+    if out is not None:
+        out.close()
+        return _finish_streamed(part_path, output_path, frame_count)
+    
+    pose_arr = pose_arr[:frame_count]
+    detected = fill_missing_frames(pose_arr)
+    return pose_arr, detected
+
+def pose_to_json(pose_arr):
+    """
+    Legacy pose_data.json bytes (a list of frames of {x, y, z, visibility} dicts),
+    built from the array only when a client asks for JSON.
+    """
+    keys = ('x', 'y', 'z', 'visibility')
+    frames = [[dict(zip(keys, lm)) for lm in frame] for frame in np.asarray(pose_arr).tolist()]
+    return orjson.dumps(frames) if orjson else json.dumps(frames).encode()
+
+def main():
+    # Get video path from command line argument or use default
+    if len(sys.argv) > 1:
+        video_path = sys.argv[1]
+    else:
+        video_path = "input/vid6.mp4"
+    
+    output_path = "output/pose_data.npy"
+    
+    pose = create_pose()
+    try:
+        pose_arr, detected = run_extraction(video_path, pose, output_path)
     except Exception as e:
-        print("Error during processing: " + str(e))
+        print("ERROR: " + str(e))
         return False
     finally:
-        cap.release()
+        pose.close()
     
-    # Save data
-    os.makedirs("output", exist_ok=True)
-    with open(output_path, 'w') as f:
-        json.dump(pose_data, f)
+    if not detected.any():
+        print("ERROR: No pose detected in any frame")
+        return False
     
-    print("SUCCESS: Saved " + str(frame_count) + " frames to " + output_path)
+    print("SUCCESS: Saved " + str(len(pose_arr)) + " frames to " + output_path)
+    # Machine-readable count for callers running this as a subprocess
+    print("FRAME_COUNT=" + str(len(pose_arr)))
     return True
 
 if __name__ == "__main__":
     success = main()
-    sys.exit(0 if success else 1)
\ No newline at end of file
+    sys.exit(0 if success else 1)
@@ -2,6 +2,7 @@
 import bpy
 import json
 import os
+import numpy as np
 from mathutils import Vector
 
 # Clear scene
@@ -14,9 +15,16 @@ with open('temp_pose.json', 'r') as f:
 if pose_data and len(pose_data) > 0:
     landmarks = pose_data[0]
     
-    # Create armature
-    bpy.ops.object.armature_add(enter_editmode=True, location=(0, 0, 0))
-    armature = bpy.context.object
+    # Create armature through the data API (no operator / stray default bone)
+    arm = bpy.data.armatures.new('Skel')
+    armature = bpy.data.objects.new('Skel', arm)
+    bpy.context.collection.objects.link(armature)
+    bpy.context.view_layer.objects.active = armature
+    armature.select_set(True)  # exported with use_selection=True
+    bpy.ops.object.mode_set(mode='EDIT')
+    eb = arm.edit_bones
+    for bone in list(eb):
+        eb.remove(bone)
     
     # Bone connections (simplified human skeleton)
     connections = [
@@ -28,22 +36,33 @@ if pose_data and len(pose_data) > 0:
     ]
     
     scale = 5.0
-    for start_idx, end_idx in connections:
-        if len(landmarks) > max(start_idx, end_idx):
-            start = landmarks[start_idx]
-            end = landmarks[end_idx]
-            
-            bone = armature.data.edit_bones.new(f"Bone_{start_idx}_{end_idx}")
-            bone.head = (start['x']*scale, start['z']*scale, start['y']*scale)
-            bone.tail = (end['x']*scale, end['z']*scale, end['y']*scale)
+    # Blender axes (x, z, y), scaled once instead of per bone
+    positions = np.asarray([[p['x'], p['z'], p['y']] for p in landmarks], dtype=np.float64) * scale
+    # Gather every bone's head/tail in one indexing op; drop bones whose
+    # landmarks are missing from this frame
+    conns = np.asarray(connections, dtype=np.intp)
+    conns = conns[conns.max(axis=1) < len(positions)]
+    heads = positions[conns[:, 0]]
+    tails = positions[conns[:, 1]]
+    for (start_idx, end_idx), head, tail in zip(conns.tolist(), heads, tails):
+        bone = eb.new(f"Bone_{start_idx}_{end_idx}")
+        bone.head = Vector(head)
+        bone.tail = Vector(tail)
     
     bpy.ops.object.mode_set(mode='OBJECT')
     
-    # Export FBX
+    # Export FBX: armature only, with every pass this scene has no use for switched off
     bpy.ops.export_scene.fbx(
         filepath='output\pose_data_skeleton.fbx',
         use_selection=True,
-        global_scale=1.0
+        global_scale=1.0,
+        object_types={'ARMATURE'},
+        bake_anim=False,
+        add_leaf_bones=False,
+        use_mesh_modifiers=False,
+        use_custom_props=False,
+        mesh_smooth_type='OFF',
+        embed_textures=False
     )
     print(" FBX export completed")
 else: